@@ -0,0 +1,275 @@
+"""
+Command-line entry point for the news aggregator.
+
+    python cli.py run [--loop]          full cycle: fetch, merge, send
+    python cli.py fetch-only            fetch and store; queued articles are sent by the next run
+    python cli.py dedup [INPUT]         deduplicate a CSV of articles
+    python cli.py send --title ...      send one test message to Telegram
+    python cli.py export [-o OUT]       copy stored articles to a CSV file or stdout
+
+Heavy dependencies (pandas, scikit-learn, feedparser) are imported inside the
+subcommands that need them, and only the environment variables of the
+subsystems a subcommand uses are validated. `--import-profile` imports the
+subcommand's modules under `python -X importtime`, without running it, and
+prints the slowest imports.
+"""
+import argparse
+import os
+import sys
+
+import config  # Cheap: settings that need the environment are resolved lazily
+
+
+def cmd_run(args):
+    config.require("fetch", "telegram", "channels", "storage")
+    import main
+
+    if args.loop:
+        main.run_forever()
+    else:
+        main.run()
+    return 0
+
+
+def cmd_fetch_only(args):
+    # Routing needs the channel chat IDs, but nothing is sent, so no bot token
+    config.require("fetch", "channels", "storage")
+    import main
+
+    main.run(deliver=False)
+    return 0
+
+
+def _dedup_csv(input_path, output_path, threshold):
+    import pandas as pd
+    from dedup import deduplicate_articles
+
+    df = pd.read_csv(input_path, encoding='utf-8-sig', keep_default_na=False)
+    unique = deduplicate_articles(df.to_dict("records"), threshold=threshold)
+    pd.DataFrame(unique, columns=df.columns).to_csv(output_path, index=False, encoding='utf-8-sig')
+    print(f"✅ Deduplicated CSV saved at {output_path}")
+
+
+def _is_live_csv(path):
+    try:
+        live_path = config.CSV_OUTPUT_PATH
+    except config.MissingSettingsError:
+        return False  # No storage configured, so no aggregator writes a CSV here
+    return os.path.abspath(path) == os.path.abspath(live_path)
+
+
+def cmd_dedup(args):
+    if not args.input:
+        config.require("storage")
+    input_path = args.input or config.CSV_OUTPUT_PATH
+    output_path = args.output or input_path
+
+    if not _is_live_csv(output_path):
+        _dedup_csv(input_path, output_path, args.threshold)
+        return 0
+
+    # Rewriting the live CSV: take the writer lock so a scheduled merge does not lose rows
+    import main
+    from work_queue import default_worker_id, load_store
+
+    store = load_store(config.WORK_QUEUE_PATH, config.WORK_QUEUE_STORE, config.MAX_TASK_ATTEMPTS)
+    try:
+        with main.csv_lock(store, default_worker_id(), wait=config.CSV_LOCK_WAIT_SECONDS):
+            _dedup_csv(input_path, output_path, args.threshold)
+    except TimeoutError as e:
+        print(f"[❌ ERROR] {e}; is a run merging right now?", file=sys.stderr)
+        return 1
+    finally:
+        store.close()
+    return 0
+
+
+def cmd_send(args):
+    config.require("telegram")
+    if not args.chat_id:
+        config.require("channels")
+    from telegram import TelegramRejected, send_message
+
+    chat_id = args.chat_id or config.TELEGRAM_CHAT_ID
+    try:
+        message_id = send_message(chat_id, args.title, args.summary, args.url)
+    except TelegramRejected:
+        return 1  # send_message already printed Telegram's reason
+    return 0 if message_id is not None else 1
+
+
+def cmd_export(args):
+    # Plain csv module: an export should not pay for pandas
+    import csv
+
+    input_path = args.input
+    if not input_path:
+        config.require("storage")
+        input_path = config.CSV_OUTPUT_PATH
+
+    if not os.path.exists(input_path):
+        print(f"[❌ ERROR] CSV file not found: {input_path}", file=sys.stderr)
+        return 1
+
+    columns = [c.strip() for c in args.columns.split(",")] if args.columns else None
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8-sig")
+    try:
+        with open(input_path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            fieldnames = columns or reader.fieldnames or []
+            writer = csv.DictWriter(out, fieldnames=fieldnames, extrasaction="ignore")
+            writer.writeheader()
+            count = 0
+            for row in reader:
+                if args.unsent and str(row.get("sent_to_telegram", "")).strip().lower() == "true":
+                    continue
+                writer.writerow(row)
+                count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if out is not sys.stdout:
+        print(f"✅ Exported {count} articles to {args.output}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Real estate news aggregator")
+    parser.add_argument("--import-profile", action="store_true",
+                        help="run the command under -X importtime and report the slowest imports")
+    parser.add_argument("--import-budget-ms", type=float, default=None,
+                        help="with --import-profile, exit non-zero if total import time exceeds this")
+    # Used by --import-profile: import the subcommand's modules and stop
+    parser.add_argument("--import-only", action="store_true", help=argparse.SUPPRESS)
+    parser.set_defaults(modules=[])
+    sub = parser.add_subparsers(dest="command", metavar="COMMAND")
+
+    p = sub.add_parser("run", help="fetch, merge and send one cycle")
+    p.add_argument("--loop", action="store_true", help="keep running every cycle")
+    p.set_defaults(func=cmd_run, modules=["main"])
+
+    p = sub.add_parser(
+        "fetch-only",
+        help="fetch, store and queue articles without sending; the next 'run' sends them",
+    )
+    p.set_defaults(func=cmd_fetch_only, modules=["main"])
+
+    p = sub.add_parser("dedup", help="deduplicate a CSV of articles")
+    p.add_argument("input", nargs="?", help="CSV to read (default: CSV_OUTPUT_PATH)")
+    p.add_argument("-o", "--output",
+                   help="CSV to write (default: overwrite input; the live CSV is rewritten under the writer lock)")
+    p.add_argument("--threshold", type=float, default=config.SIMILARITY_THRESHOLD,
+                   help=f"similarity threshold (default: {config.SIMILARITY_THRESHOLD})")
+    p.set_defaults(func=cmd_dedup, modules=[
+        "pandas", "dedup", "sklearn.feature_extraction.text", "sklearn.metrics.pairwise", "main",
+    ])
+
+    p = sub.add_parser("send", help="send one message to Telegram")
+    p.add_argument("--title", required=True)
+    p.add_argument("--summary", default="")
+    p.add_argument("--url", default="")
+    p.add_argument("--chat-id", help="chat to send to (default: TELEGRAM_CHAT_ID)")
+    p.set_defaults(func=cmd_send, modules=["telegram"])
+
+    p = sub.add_parser("export", help="export stored articles as CSV")
+    p.add_argument("-i", "--input", help="CSV to read (default: CSV_OUTPUT_PATH)")
+    p.add_argument("-o", "--output", default="-", help="file to write, or - for stdout (default)")
+    p.add_argument("--columns", help="comma-separated columns to keep")
+    p.add_argument("--unsent", action="store_true", help="only articles not yet sent to Telegram")
+    p.set_defaults(func=cmd_export, modules=["csv"])
+
+    return parser
+
+
+def _strip_profile_flags(argv):
+    stripped = []
+    skip_next = False
+    for arg in argv:
+        if skip_next:
+            skip_next = False
+            continue
+        if arg == "--import-profile" or arg.startswith("--import-budget-ms="):
+            continue
+        if arg == "--import-budget-ms":
+            skip_next = True
+            continue
+        stripped.append(arg)
+    return stripped
+
+
+def parse_importtime(lines):
+    """Parse `-X importtime` lines into (module, depth, self_us, cumulative_us) tuples."""
+    entries = []
+    for line in lines:
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # Header line
+        raw = parts[2].rstrip()
+        depth = (len(raw) - len(raw.lstrip()) - 1) // 2
+        entries.append((raw.strip(), depth, self_us, cumulative_us))
+    return entries
+
+
+def import_profile(argv, budget_ms=None, top=15):
+    """
+    Re-run this CLI with -X importtime and --import-only, so the subcommand's
+    modules are imported but nothing is fetched or sent, and report where
+    startup time goes.
+    """
+    import subprocess
+
+    cmd = [sys.executable, "-X", "importtime", os.path.abspath(__file__), "--import-only"]
+    cmd += _strip_profile_flags(argv)
+    result = subprocess.run(cmd, stderr=subprocess.PIPE, text=True)
+
+    stderr_lines = result.stderr.splitlines()
+    for line in stderr_lines:
+        if not line.startswith("import time:"):
+            print(line, file=sys.stderr)
+
+    entries = parse_importtime(stderr_lines)
+    top_level = [e for e in entries if e[1] == 0]
+    total_ms = sum(e[3] for e in top_level) / 1000
+
+    print("\n📊 Import profile", file=sys.stderr)
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module", file=sys.stderr)
+    for name, _, self_us, cumulative_us in sorted(top_level, key=lambda e: e[3], reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}", file=sys.stderr)
+    print(f"Total: {total_ms:.1f} ms across {len(entries)} modules", file=sys.stderr)
+
+    if budget_ms is not None and total_ms > budget_ms:
+        print(f"[❌ ERROR] Import time {total_ms:.1f} ms exceeds budget of {budget_ms:.1f} ms", file=sys.stderr)
+        return result.returncode or 2
+    return result.returncode
+
+
+def cli(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.import_profile:
+        return import_profile(argv, args.import_budget_ms)
+    try:
+        if args.import_only:
+            import importlib
+            for module in args.modules:
+                importlib.import_module(module)
+            return 0
+        if not args.command:
+            parser.print_help()
+            return 0
+        return args.func(args)
+    except config.MissingSettingsError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
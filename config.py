@@ -1,29 +1,50 @@
-from dotenv import load_dotenv
 import os
+import socket
 
-load_dotenv()  # Load .env file environment variables
-
-# Load environment variables once
-GNEWS_API_KEY = os.getenv("GNEWS_API_KEY")
-MEDIASTACK_API_KEY = os.getenv("MEDIASTACK_API_KEY")
-NEWS_API = os.getenv("NEWS_API")
-TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
-ONEDRIVE_FOLDER = os.getenv("ONEDRIVE_FOLDER")
-
-# Validate all required environment variables
-REQUIRED_ENV_VARS = {
-    "GNEWS_API_KEY": GNEWS_API_KEY,
-    "MEDIASTACK_API_KEY": MEDIASTACK_API_KEY,
-    "NEWS_API": NEWS_API,
-    "TELEGRAM_BOT_TOKEN": TELEGRAM_BOT_TOKEN,
-    "TELEGRAM_CHAT_ID": TELEGRAM_CHAT_ID,
-    "ONEDRIVE_FOLDER": ONEDRIVE_FOLDER,
+# Environment-backed settings (API keys, chat IDs, paths) are resolved lazily
+# through the module __getattr__ below: the .env file is loaded on first use,
+# and only the variables of the subsystem being accessed are validated. So
+# `config.TELEGRAM_BOT_TOKEN` checks the Telegram settings, but not the news
+# API keys. Read these as config.X where they are used: `from config import X`
+# at module level would resolve them, and demand the variables, on import.
+
+# Required environment variables, grouped by the subsystem that needs them
+SUBSYSTEM_ENV_VARS = {
+    "fetch": ["GNEWS_API_KEY", "MEDIASTACK_API_KEY", "NEWS_API"],
+    "telegram": ["TELEGRAM_BOT_TOKEN"],
+    "channels": ["TELEGRAM_CHAT_ID"],
+    "storage": ["ONEDRIVE_FOLDER"],
 }
 
-missing_vars = [key for key, val in REQUIRED_ENV_VARS.items() if not val]
-if missing_vars:
-    raise EnvironmentError(f"❌ Missing required environment variables: {', '.join(missing_vars)}")
+_env_loaded = False
+
+
+class MissingSettingsError(EnvironmentError):
+    """Raised when a subsystem's required environment variables are not set."""
+
+
+def _load_env():
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()  # Load .env file environment variables
+        _env_loaded = True
+
+
+def require(*subsystems):
+    """
+    Validate the environment variables needed by the given subsystems
+    ("fetch", "telegram", "channels", "storage"). With no arguments,
+    validates all of them.
+    """
+    _load_env()
+    names = []
+    for subsystem in subsystems or SUBSYSTEM_ENV_VARS:
+        names.extend(SUBSYSTEM_ENV_VARS[subsystem])
+    missing_vars = [key for key in names if not os.getenv(key)]
+    if missing_vars:
+        raise MissingSettingsError(f"❌ Missing required environment variables: {', '.join(missing_vars)}")
+
 
 # Configuration constants
 LANGUAGES = {"en": "English"}
@@ -49,10 +70,98 @@ RSS_FEEDS = [
 ]
 
 
+# Telegram channels and their routing rules. An article goes to every channel
+# with a keyword in its title or summary; a channel without keywords gets every
+# article. Channels whose chat ID is not set in the environment are skipped.
+# min_interval is the minimum number of seconds between sends on that channel.
+def _telegram_channels():
+    return [
+        {
+            "name": "default",
+            "chat_id": os.getenv("TELEGRAM_CHAT_ID"),
+            "keywords": [],
+            "min_interval": 5,
+        },
+        {
+            "name": "residential",
+            "chat_id": os.getenv("TELEGRAM_CHAT_ID_RESIDENTIAL"),
+            "keywords": ["residential", "housing", "apartment", "apartments", "flats", "villa", "affordable housing"],
+            "min_interval": 5,
+        },
+        {
+            "name": "commercial",
+            "chat_id": os.getenv("TELEGRAM_CHAT_ID_COMMERCIAL"),
+            "keywords": ["commercial", "office space", "retail space", "warehousing", "co-working", "REIT"],
+            "min_interval": 5,
+        },
+        {
+            "name": "legal",
+            "chat_id": os.getenv("TELEGRAM_CHAT_ID_LEGAL"),
+            "keywords": ["RERA", "court", "tribunal", "NCLT", "stamp duty", "land acquisition", "insolvency"],
+            "min_interval": 5,
+        },
+        {
+            "name": "kolkata",
+            "chat_id": os.getenv("TELEGRAM_CHAT_ID_KOLKATA"),
+            "keywords": ["Kolkata", "West Bengal", "New Town", "Rajarhat"],
+            "min_interval": 5,
+        },
+    ]
+
+
 MAX_RESULTS_PER_KEYWORD = 10
 FETCH_ENGLISH = True
 
-CSV_OUTPUT_PATH = os.path.join(ONEDRIVE_FOLDER, "real_estate_kolkata.csv")
+# Shared work queue (see work_queue.py). Instances that point at the same
+# queue split each cycle's fetch and delivery work between them. Set
+# WORK_QUEUE_PATH / WORK_QUEUE_STORE ("module:ClassName" for a custom
+# TaskStore) in the environment to override the local SQLite default.
+CYCLE_MINUTES = 30
+FETCH_LEASE_SECONDS = 120
+MERGE_LEASE_SECONDS = 120
+# How long a CSV writer waits for another to finish; well under MERGE_LEASE_SECONDS
+CSV_LOCK_WAIT_SECONDS = 60
+# Longer than one send_message call with all its retries (5 x 60 s timeout + backoff)
+DELIVERY_LEASE_SECONDS = 360
+DELIVERY_RETRY_SECONDS = 600
+MAX_TASK_ATTEMPTS = 3
+TASK_RETENTION_DAYS = 7
 
 SIMILARITY_THRESHOLD = 0.75
 MERGE_DUPLICATE_URLS = True
+
+
+# Settings derived from the environment: name -> (subsystem to validate, factory)
+_LAZY_SETTINGS = {
+    "GNEWS_API_KEY": ("fetch", lambda: os.getenv("GNEWS_API_KEY")),
+    "MEDIASTACK_API_KEY": ("fetch", lambda: os.getenv("MEDIASTACK_API_KEY")),
+    "NEWS_API": ("fetch", lambda: os.getenv("NEWS_API")),
+    "TELEGRAM_BOT_TOKEN": ("telegram", lambda: os.getenv("TELEGRAM_BOT_TOKEN")),
+    "TELEGRAM_CHAT_ID": ("channels", lambda: os.getenv("TELEGRAM_CHAT_ID")),
+    "TELEGRAM_CHANNELS": ("channels", _telegram_channels),
+    "ONEDRIVE_FOLDER": ("storage", lambda: os.getenv("ONEDRIVE_FOLDER")),
+    "CSV_OUTPUT_PATH": ("storage", lambda: os.path.join(os.getenv("ONEDRIVE_FOLDER"), "real_estate_kolkata.csv")),
+    # This host's write-ahead log of Telegram deliveries (see ledger.py). Keep it on
+    # local disk: the shared work queue is what instances use to agree on what was
+    # sent, and concurrent appends through OneDrive or a network share get lost.
+    "LEDGER_PATH": (None, lambda: os.getenv("LEDGER_PATH") or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), f"delivery_ledger.{socket.gethostname()}.jsonl"
+    )),
+    "WORK_QUEUE_PATH": (None, lambda: os.getenv("WORK_QUEUE_PATH") or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "work_queue.sqlite3"
+    )),
+    "WORK_QUEUE_STORE": (None, lambda: os.getenv("WORK_QUEUE_STORE")),
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY_SETTINGS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    subsystem, factory = _LAZY_SETTINGS[name]
+    if subsystem:
+        require(subsystem)
+    else:
+        _load_env()
+    value = factory()
+    globals()[name] = value  # Resolve once; later lookups skip __getattr__
+    return value
@@ -1,7 +1,5 @@
 import re
 from difflib import SequenceMatcher
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 
 def clean_text(text):
     """Lowercase, remove punctuation and extra whitespace."""
@@ -23,6 +21,10 @@ def is_similar(text1, text2, threshold=0.75):
 
 def cosine_sim(text1, text2, threshold=0.75):
     """TF-IDF cosine similarity check."""
+    # scikit-learn is imported on first use; it dominates startup time otherwise
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
+
     try:
         vectorizer = TfidfVectorizer(stop_words='english')
         vectors = vectorizer.fit_transform([text1, text2])
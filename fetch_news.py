@@ -134,10 +134,8 @@ import requests
 import pandas as pd
 import feedparser
 from datetime import datetime, timezone
+import config  # API keys are read as config.X when a request is made, not at import
 from config import (
-    GNEWS_API_KEY,
-    NEWS_API,
-    MEDIASTACK_API_KEY,
     MAX_RESULTS_PER_KEYWORD,
     RSS_FEEDS,
     ENGLISH_KEYWORDS,
@@ -158,121 +156,146 @@ def _matches_keywords(article, keywords):
     text = (article.get("title", "") + " " + article.get("summary", "")).lower()
     return any(k.lower() in text for k in keywords)
 
-def fetch_news_simple(keyword=None, lang="en", from_date=None):
+def fetch_gnews(keyword, lang="en", from_date=None, limit=MAX_RESULTS_PER_KEYWORD):
     articles = []
+    try:
+        params = {
+            "q": keyword,
+            "lang": lang,
+            "max": limit,
+            "token": config.GNEWS_API_KEY,
+        }
+        if from_date:
+            params["from"] = from_date
 
-    # ==== 1. GNews API ====
-    if keyword:
-        try:
-            params = {
-                "q": keyword,
-                "lang": lang,
-                "max": MAX_RESULTS_PER_KEYWORD,
-                "token": GNEWS_API_KEY,
-            }
-            if from_date:
-                params["from"] = from_date
+        r = requests.get("https://gnews.io/api/v4/search", params=params)
+        r.raise_for_status()
+        data = r.json()
+        for item in data.get("articles", []):
+            published_at = _safe_get_str(item, "publishedAt")
+            if not _is_today(published_at):
+                continue
+            articles.append({
+                "title": _safe_get_str(item, "title"),
+                "url": _safe_get_str(item, "url"),
+                "summary": _safe_get_str(item, "description"),
+                "publishedAt": published_at,
+            })
+        print(f"[✅ GNews] {len(articles)} today's articles for: {keyword}")
+    except Exception as e:
+        print(f"[❌ GNews ERROR] {keyword}: {e}")
+    return articles
 
-            r = requests.get("https://gnews.io/api/v4/search", params=params)
-            r.raise_for_status()
-            data = r.json()
-            for item in data.get("articles", []):
-                published_at = _safe_get_str(item, "publishedAt")
-                if not _is_today(published_at):
-                    continue
-                articles.append({
-                    "title": _safe_get_str(item, "title"),
-                    "url": _safe_get_str(item, "url"),
-                    "summary": _safe_get_str(item, "description"),
-                    "publishedAt": published_at,
-                })
-            print(f"[✅ GNews] {len(articles)} today's articles for: {keyword}")
-        except Exception as e:
-            print(f"[❌ GNews ERROR] {keyword}: {e}")
+def fetch_newsapi(keyword, lang="en", from_date=None, limit=MAX_RESULTS_PER_KEYWORD):
+    articles = []
+    try:
+        params = {
+            "q": keyword,
+            "language": lang,
+            "pageSize": limit,
+            "sortBy": "publishedAt",
+            "apiKey": config.NEWS_API,
+        }
+        if from_date:
+            params["from"] = from_date
 
-    # ==== 2. NewsAPI ====
-    if keyword and len(articles) < MAX_RESULTS_PER_KEYWORD:
-        try:
-            params = {
-                "q": keyword,
-                "language": lang,
-                "pageSize": MAX_RESULTS_PER_KEYWORD - len(articles),
-                "sortBy": "publishedAt",
-                "apiKey": NEWS_API,
-            }
-            if from_date:
-                params["from"] = from_date
+        r = requests.get("https://newsapi.org/v2/everything", params=params)
+        r.raise_for_status()
+        data = r.json()
+        for item in data.get("articles", []):
+            published_at = _safe_get_str(item, "publishedAt")
+            if not _is_today(published_at):
+                continue
+            articles.append({
+                "title": _safe_get_str(item, "title"),
+                "url": _safe_get_str(item, "url"),
+                "summary": _safe_get_str(item, "description"),
+                "publishedAt": published_at,
+            })
+        print(f"[✅ NewsAPI] {len(data.get('articles', []))} fetched, {len(articles)} today's for: {keyword}")
+    except Exception as e:
+        print(f"[❌ NewsAPI ERROR] {keyword}: {e}")
+    return articles
 
-            r = requests.get("https://newsapi.org/v2/everything", params=params)
-            r.raise_for_status()
-            data = r.json()
-            for item in data.get("articles", []):
-                published_at = _safe_get_str(item, "publishedAt")
-                if not _is_today(published_at):
-                    continue
-                articles.append({
-                    "title": _safe_get_str(item, "title"),
-                    "url": _safe_get_str(item, "url"),
-                    "summary": _safe_get_str(item, "description"),
-                    "publishedAt": published_at,
-                })
-            print(f"[✅ NewsAPI] {len(data.get('articles', []))} fetched, {len([a for a in articles if _is_today(a['publishedAt'])])} today's for: {keyword}")
-        except Exception as e:
-            print(f"[❌ NewsAPI ERROR] {keyword}: {e}")
+def fetch_mediastack(keyword, lang="en", from_date=None, limit=MAX_RESULTS_PER_KEYWORD):
+    articles = []
+    try:
+        params = {
+            "access_key": config.MEDIASTACK_API_KEY,
+            "keywords": keyword,
+            "languages": lang,
+            "limit": limit,
+            "sort": "published_desc",
+        }
+        if from_date:
+            params["date"] = from_date.split("T")[0]
 
-    # ==== 3. Mediastack (fallback) ====
-    if keyword and len(articles) < MAX_RESULTS_PER_KEYWORD:
-        try:
-            params = {
-                "access_key": MEDIASTACK_API_KEY,
-                "keywords": keyword,
-                "languages": lang,
-                "limit": MAX_RESULTS_PER_KEYWORD - len(articles),
-                "sort": "published_desc",
+        r = requests.get("https://api.mediastack.com/v1/news", params=params)
+        r.raise_for_status()
+        data = r.json()
+        for item in data.get("data", []):
+            published_at = _safe_get_str(item, "publishedAt", "published_at")
+            if not _is_today(published_at):
+                continue
+            articles.append({
+                "title": _safe_get_str(item, "title"),
+                "url": _safe_get_str(item, "url"),
+                "summary": _safe_get_str(item, "description"),
+                "publishedAt": published_at,
+            })
+        print(f"[✅ Mediastack] {len(data.get('data', []))} fetched, {len(articles)} today's for: {keyword}")
+    except Exception as e:
+        print(f"[❌ Mediastack ERROR] {keyword}: {e}")
+    return articles
+
+def fetch_rss_feed(rss_url, keywords=None):
+    """Today's entries from one RSS feed that match any of the keywords (default: ENGLISH_KEYWORDS)."""
+    articles = []
+    keywords_to_check = keywords or ENGLISH_KEYWORDS
+    try:
+        feed = feedparser.parse(rss_url)
+        feed_source = feed.feed.get("title", rss_url)
+        for entry in feed.entries:
+            published_at = getattr(entry, "published", None) or entry.get("updated", "")
+            if not _is_today(published_at):
+                continue
+            article = {
+                "title": entry.get("title"),
+                "url": entry.get("link"),
+                "summary": entry.get("summary", ""),
+                "publishedAt": published_at,
+                "source": feed_source
             }
-            if from_date:
-                params["date"] = from_date.split("T")[0]
+            if matches_keywords(article, keywords_to_check):
+                articles.append(article)
+    except Exception as e:
+        print(f"[❌ RSS ERROR] {rss_url}: {e}")
+    return articles
 
-            r = requests.get("https://api.mediastack.com/v1/news", params=params)
-            r.raise_for_status()
-            data = r.json()
-            for item in data.get("data", []):
-                published_at = _safe_get_str(item, "publishedAt", "published_at")
-                if not _is_today(published_at):
-                    continue
-                articles.append({
-                    "title": _safe_get_str(item, "title"),
-                    "url": _safe_get_str(item, "url"),
-                    "summary": _safe_get_str(item, "description"),
-                    "publishedAt": published_at,
-                })
-            print(f"[✅ Mediastack] {len(data.get('data', []))} fetched, {len([a for a in articles if _is_today(a['publishedAt'])])} today's for: {keyword}")
-        except Exception as e:
-            print(f"[❌ Mediastack ERROR] {keyword}: {e}")
+# Keyword search providers, in fallback order. Each can also run on its own
+# as a work-queue task (see main.py).
+API_PROVIDERS = {
+    "gnews": fetch_gnews,
+    "newsapi": fetch_newsapi,
+    "mediastack": fetch_mediastack,
+}
+
+def fetch_news_simple(keyword=None, lang="en", from_date=None):
+    articles = []
+
+    # ==== 1-3. GNews, NewsAPI, Mediastack (fallback) ====
+    if keyword:
+        for fetch in API_PROVIDERS.values():
+            if len(articles) >= MAX_RESULTS_PER_KEYWORD:
+                break
+            articles.extend(fetch(keyword, lang, from_date, MAX_RESULTS_PER_KEYWORD - len(articles)))
 
     # ==== 4. RSS feeds ====
-    try:
-        for rss_url in RSS_FEEDS:
-            feed = feedparser.parse(rss_url)
-            feed_source = feed.feed.get("title", rss_url)
-            for entry in feed.entries:
-                published_at = getattr(entry, "published", None) or entry.get("updated", "")
-                if not _is_today(published_at):
-                    continue
-                article = {
-                    "title": entry.get("title"),
-                    "url": entry.get("link"),
-                    "summary": entry.get("summary", ""),
-                    "publishedAt": published_at,
-                    "source": feed_source
-                }
-                # When keyword is None, filter with all ENGLISH_KEYWORDS, else filter with keyword only
-                keywords_to_check = [keyword] if keyword else ENGLISH_KEYWORDS
-                if matches_keywords(article, keywords_to_check):
-                    articles.append(article)
-        print(f"[✅ RSS] Total {len(articles)} today's articles matching keywords from RSS feeds")
-    except Exception as e:
-        print(f"[❌ RSS ERROR] {e}")
+    # When keyword is None, filter with all ENGLISH_KEYWORDS, else filter with keyword only
+    keywords_to_check = [keyword] if keyword else ENGLISH_KEYWORDS
+    for rss_url in RSS_FEEDS:
+        articles.extend(fetch_rss_feed(rss_url, keywords_to_check))
+    print(f"[✅ RSS] Total {len(articles)} today's articles matching keywords from RSS feeds")
 
     return articles
 
@@ -0,0 +1,242 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+DEFAULT_CHANNEL = "default"
+
+# Rewrite the log on startup once it is this large and at least a quarter of it
+# is the text of articles that have already been delivered
+COMPACT_BYTES = 4 * 1024 * 1024
+
+
+def article_id(article) -> str:
+    """
+    Stable ID for an article, derived from the same (title, url) pair
+    the CSV uses to drop duplicates.
+    """
+    title = article.get("title") or ""
+    url = article.get("url") or ""
+    if not isinstance(title, str):
+        title = ""
+    if not isinstance(url, str):
+        url = ""
+    key = f"{title.strip()}\n{url.strip()}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+class DeliveryLedger:
+    """
+    Append-only write-ahead log of the Telegram deliveries made by this host.
+    Each host keeps its own file on local disk; the shared work queue is the
+    record used across hosts (see main.sync_ledger).
+
+    Every line is a JSON record:
+        {"op": "queued", "id": ..., "article": {...}, "channels": [...]}
+        {"op": "sent", "id": ..., "channel": ..., "chat_id": ..., "message_id": ...}
+        {"op": "seeded"}
+
+    An article is queued once with the channels it was routed to, and gets
+    one "sent" record per channel. Each record is flushed and fsynced before
+    the call returns, so a crash or timeout loses at most the sends that were
+    in flight. On startup the log is replayed into hash indexes (sent
+    deliveries and pending articles), which makes "was this sent?" and "what
+    is still pending?" O(1) / O(pending) instead of a scan over the whole
+    CSV history. Records written before channel routing existed have no
+    "channels"/"channel" field and are read as DEFAULT_CHANNEL. "seeded"
+    marks that the sent flags of the pre-ledger CSV have been copied in.
+
+    Once the file passes compact_bytes and a quarter of it is "queued"
+    records of delivered articles, it is rewritten on startup to one "sent"
+    record per delivery and one "queued" record per pending article, which
+    keeps replay proportional to what was sent rather than to everything
+    ever fetched. Only one process at a time should use a ledger file.
+    """
+
+    def __init__(self, path: str, compact_bytes: int = COMPACT_BYTES):
+        self.path = path
+        self._records = 0              # records read from the file on startup
+        self._queued_bytes = {}        # article_id -> size of its "queued" record, while loading
+        self._known = set()            # every article_id ever queued or sent
+        self._sent = {}                # article_id -> {channel: {"chat_id", "message_id"}}
+        self._pending = OrderedDict()  # article_id -> (article, set of channels left), in queue order
+        self._lock = threading.Lock()
+        self.seeded = False
+        self._load()
+        if self._records:
+            size = os.path.getsize(path)
+            delivered = sum(n for aid, n in self._queued_bytes.items() if aid not in self._pending)
+            if size > compact_bytes and delivered * 4 >= size:
+                self._compact()
+        self._queued_bytes = {}
+
+        dir_path = os.path.dirname(path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+        self._fh = open(path, "a", encoding="utf-8")
+        if self._fh.tell() > 0:
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+            if torn:
+                # Terminate a torn record so the next append starts on its own line
+                self._fh.write("\n")
+                self._fh.flush()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final write from a crash; everything before it is intact.
+                    print(f"[⚠️ Ledger] Skipping unreadable record at line {line_no}")
+                    continue
+                self._apply(record)
+                self._records += 1
+                if record.get("op") == "queued":
+                    self._queued_bytes[record.get("id")] = len(line)
+        print(f"[ℹ️ Ledger] Loaded {len(self._sent)} sent, {len(self._pending)} pending from {self.path}")
+
+    def _apply(self, record):
+        op = record.get("op")
+        if op == "seeded":
+            self.seeded = True
+            return
+        aid = record.get("id")
+        if not aid:
+            return
+        self._known.add(aid)
+        if op == "queued":
+            done = self._sent.get(aid, {})
+            channels = record.get("channels")
+            if channels is None:
+                channels = [DEFAULT_CHANNEL]
+            left = {c for c in channels if c not in done}
+            if left:
+                self._pending[aid] = (record.get("article") or {}, left)
+        elif op == "sent":
+            channel = record.get("channel") or DEFAULT_CHANNEL
+            self._sent.setdefault(aid, {})[channel] = {
+                "chat_id": record.get("chat_id"),
+                "message_id": record.get("message_id"),
+            }
+            if aid in self._pending:
+                left = self._pending[aid][1]
+                left.discard(channel)
+                if not left:
+                    del self._pending[aid]
+
+    def _live_records(self):
+        return sum(len(channels) for channels in self._sent.values()) + len(self._pending) + 1
+
+    def _compact(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            if self.seeded:
+                f.write(json.dumps({"op": "seeded"}) + "\n")
+            for aid, channels in self._sent.items():
+                for channel, delivery in channels.items():
+                    f.write(json.dumps({"op": "sent", "id": aid, "channel": channel, **delivery}) + "\n")
+            # Sent records come first, so only the channels still to go are listed
+            for aid, (art, left) in self._pending.items():
+                record = {"op": "queued", "id": aid, "article": art, "channels": sorted(left)}
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        print(f"[ℹ️ Ledger] Compacted {self._records} records to {self._live_records()}")
+
+    def _append(self, *records):
+        """Write records with a single fsync; they are durable once this returns."""
+        self._fh.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        for record in records:
+            self._apply(record)
+
+    def is_sent(self, aid: str) -> bool:
+        """True once the article has been delivered to every channel it was routed to."""
+        return aid in self._known and aid not in self._pending
+
+    def is_sent_to(self, aid: str, channel: str) -> bool:
+        return channel in self._sent.get(aid, {})
+
+    def is_known(self, aid: str) -> bool:
+        return aid in self._known
+
+    def sent_ids(self):
+        return self._known - set(self._pending)
+
+    def pending(self):
+        """Return (article_id, article, channel) deliveries not yet made, oldest first."""
+        with self._lock:
+            return [
+                (aid, art, channel)
+                for aid, (art, left) in self._pending.items()
+                for channel in sorted(left)
+            ]
+
+    def enqueue(self, article, channels=None) -> bool:
+        """
+        Record an article as awaiting delivery to the given channels.
+        Returns False if the article is already known.
+        """
+        aid = article_id(article)
+        if channels is None:
+            channels = [DEFAULT_CHANNEL]
+        with self._lock:
+            if self.is_known(aid):
+                return False
+            entry = {k: article.get(k, "") for k in ("title", "summary", "url", "publishedAt")}
+            self._append({"op": "queued", "id": aid, "article": entry, "channels": list(channels)})
+            return True
+
+    def mark_sent(self, aid: str, channel=DEFAULT_CHANNEL, chat_id=None, message_id=None):
+        """Durably record a delivery. Call right after Telegram accepted the message."""
+        with self._lock:
+            if channel in self._sent.get(aid, {}):
+                return
+            self._append({
+                "op": "sent",
+                "id": aid,
+                "channel": channel,
+                "chat_id": chat_id,
+                "message_id": message_id,
+            })
+
+    def mark_sent_many(self, aids, channel=DEFAULT_CHANNEL) -> int:
+        """Record several deliveries with one fsync, e.g. when seeding. Returns how many were new."""
+        with self._lock:
+            new, seen = [], set()
+            for aid in aids:
+                if channel in self._sent.get(aid, {}) or aid in seen:
+                    continue
+                seen.add(aid)
+                new.append({"op": "sent", "id": aid, "channel": channel, "chat_id": None, "message_id": None})
+            if new:
+                self._append(*new)
+            return len(new)
+
+    def mark_seeded(self):
+        """Record that the CSV's historical sent flags have been copied into the ledger."""
+        with self._lock:
+            if not self.seeded:
+                self._append({"op": "seeded"})
+
+    def close(self):
+        with self._lock:
+            if not self._fh.closed:
+                self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
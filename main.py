@@ -1,13 +1,31 @@
 import time
-import schedule
 import pandas as pd
+from contextlib import contextmanager
 from datetime import datetime, timezone
 
-from config import ENGLISH_KEYWORDS, TELEGRAM_CHAT_ID, FETCH_ENGLISH, CSV_OUTPUT_PATH
-from fetch_news import fetch_news_simple
+import config  # Settings from the environment are read as config.X when used, not at import
+from config import (
+    ENGLISH_KEYWORDS,
+    RSS_FEEDS,
+    FETCH_ENGLISH,
+    CYCLE_MINUTES,
+    FETCH_LEASE_SECONDS,
+    MERGE_LEASE_SECONDS,
+    CSV_LOCK_WAIT_SECONDS,
+    DELIVERY_LEASE_SECONDS,
+    DELIVERY_RETRY_SECONDS,
+    MAX_TASK_ATTEMPTS,
+    TASK_RETENTION_DAYS,
+)
+from fetch_news import API_PROVIDERS, fetch_rss_feed
 from dedup import deduplicate_articles
 from utils import get_last_published_time
-from telegram import send_message  # Adjust import path as needed
+from ledger import DeliveryLedger, article_id
+from router import ChannelRouter
+from work_queue import load_store, drain, default_worker_id, keep_alive
+
+FETCH_KINDS = ["fetch", "feed"]
+CSV_LOCK = "csv-writer"
 
 
 def filter_articles_today(articles):
@@ -24,76 +42,304 @@ def filter_articles_today(articles):
     return filtered
 
 
-def run():
-    last_time = get_last_published_time()
-    from_date = last_time.isoformat() if last_time else None
-    all_news = []
+def current_cycle(now=None):
+    """ID of the schedule slot this run belongs to; every instance in the same slot shares its tasks."""
+    now = now or datetime.now(timezone.utc)
+    slot = now.replace(minute=now.minute - now.minute % CYCLE_MINUTES, second=0, microsecond=0)
+    return slot.strftime("%Y-%m-%dT%H:%M")
+
+
+def enqueue_fetch_tasks(store, cycle, from_date):
+    """One task per keyword x API provider and one per RSS feed."""
+    if not FETCH_ENGLISH:
+        return
+    for kw in ENGLISH_KEYWORDS:
+        for provider in API_PROVIDERS:
+            store.enqueue(
+                f"{cycle}:fetch:{provider}:{kw}", cycle, "fetch",
+                {"provider": provider, "keyword": kw, "from_date": from_date},
+            )
+    for rss_url in RSS_FEEDS:
+        store.enqueue(f"{cycle}:feed:{rss_url}", cycle, "feed", {"url": rss_url, "from_date": from_date})
+
+
+def run_fetch_task(task):
+    p = task.payload
+    if task.kind == "fetch":
+        news = API_PROVIDERS[p["provider"]](p["keyword"], lang="en", from_date=p["from_date"])
+        time.sleep(1)
+    else:
+        news = fetch_rss_feed(p["url"])
+
+    if p.get("from_date"):
+        last_time = pd.to_datetime(p["from_date"], utc=True)
+        news = [n for n in news if pd.to_datetime(n.get("publishedAt", ""), errors="coerce", utc=True) > last_time]
+    return news
+
+
+def delivery_key(aid, channel):
+    return f"deliver:{channel}:{aid}"
+
+
+def enqueue_delivery(store, cycle, aid, article, channel):
+    store.enqueue(
+        delivery_key(aid, channel), cycle, "deliver",
+        {"id": aid, "channel": channel, "article": article},
+        ref=aid,
+    )
+
+
+def sync_ledger(store, ledger, cycle):
+    """
+    Reconcile the local ledger with the shared queue, which is the record of
+    what every instance has sent: deliveries completed elsewhere are marked
+    sent locally, and ones the queue has never seen (e.g. a crash between
+    writing the ledger and enqueueing) are offered again.
+    """
+    for aid, art, channel in ledger.pending():
+        state = store.status(delivery_key(aid, channel))
+        if state is None:
+            enqueue_delivery(store, cycle, aid, art, channel)
+        elif state[0] == "done":
+            result = state[1] or {}
+            ledger.mark_sent(aid, channel, result.get("chat_id"), result.get("message_id"))
 
-    if FETCH_ENGLISH:
-        # Fetch API news per keyword
-        for kw in ENGLISH_KEYWORDS:
-            news = fetch_news_simple(kw, lang="en", from_date=from_date)
-            if last_time:
-                news = [n for n in news if pd.to_datetime(n.get("publishedAt", ""), errors="coerce") > last_time]
-            all_news.extend(news)
-            time.sleep(1)
 
-        # Fetch RSS news once
-        rss_news = fetch_news_simple(keyword=None)
-        if last_time:
-            rss_news = [n for n in rss_news if pd.to_datetime(n.get("publishedAt", ""), errors="coerce") > last_time]
-        all_news.extend(rss_news)
+@contextmanager
+def csv_lock(store, worker, wait=CSV_LOCK_WAIT_SECONDS, poll_interval=2):
+    """
+    Hold the store-wide CSV writer lock. It is not tied to a cycle, so
+    instances whose runs straddle a slot boundary still take turns on the
+    CSV instead of overwriting each other's rows. The lock is renewed while
+    held, so a slow write keeps it; a holder that dies loses it after
+    MERGE_LEASE_SECONDS.
+    """
+    deadline = time.monotonic() + wait
+    while True:
+        token = store.acquire_lock(CSV_LOCK, worker, MERGE_LEASE_SECONDS)
+        if token:
+            break
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Could not take the {CSV_LOCK} lock within {wait}s")
+        time.sleep(poll_interval)
+    try:
+        with keep_alive(lambda: store.extend_lock(CSV_LOCK, token, MERGE_LEASE_SECONDS),
+                        MERGE_LEASE_SECONDS / 3, f"the {CSV_LOCK} lock"):
+            yield
+    finally:
+        store.release_lock(CSV_LOCK, token)
+
+
+def _flag_is_true(value):
+    return str(value).strip().lower() == "true"
+
+
+def seed_ledger(ledger):
+    """
+    Copy the sent flags of a CSV written before the ledger existed. Runs until
+    it completes once, whether or not the current cycle fetches anything.
+    """
+    if ledger.seeded:
+        return
+    try:
+        df = pd.read_csv(config.CSV_OUTPUT_PATH, encoding='utf-8-sig')
+    except FileNotFoundError:
+        df = None
+    if df is not None and 'sent_to_telegram' in df.columns:
+        sent_rows = df[df['sent_to_telegram'].map(_flag_is_true)]
+        seeded = ledger.mark_sent_many(
+            article_id({"title": title, "url": url}) for title, url in zip(sent_rows['title'], sent_rows['url'])
+        )
+        print(f"[ℹ️ Ledger] Seeded {seeded} sent articles from {config.CSV_OUTPUT_PATH}")
+    ledger.mark_seeded()
+
+
+def sent_flags(df, sent_ids):
+    """sent_to_telegram for each row; a row already flagged True stays True and is not hashed again."""
+    previous = df['sent_to_telegram'] if 'sent_to_telegram' in df.columns else [False] * len(df)
+    return [
+        _flag_is_true(prev) or article_id({"title": title, "url": url}) in sent_ids
+        for prev, title, url in zip(previous, df['title'], df['url'])
+    ]
 
+
+def merge_cycle(store, ledger, router, worker, cycle):
+    """
+    Deduplicate everything the cycle's fetch tasks found, merge it into the
+    CSV and queue deliveries. Runs as a single "merge" task per cycle, and
+    the CSV read-modify-write happens under the CSV writer lock. Returns the
+    number of articles merged.
+    """
+    all_news = [a for result in store.results(cycle, FETCH_KINDS) for a in result]
     unique_news = deduplicate_articles(all_news)
 
-    if unique_news:
-        # Load existing CSV
+    if not unique_news:
+        print("No new articles fetched.")
+        return 0
+
+    with csv_lock(store, worker):
+        return _merge_into_csv(store, ledger, router, cycle, unique_news)
+
+
+def _merge_into_csv(store, ledger, router, cycle, unique_news):
+    # Load existing CSV
+    try:
+        df = pd.read_csv(config.CSV_OUTPUT_PATH, encoding='utf-8-sig')
+        if 'sent_to_telegram' not in df.columns:
+            df['sent_to_telegram'] = False
+    except FileNotFoundError:
+        # No CSV exists yet
+        df = pd.DataFrame(columns=["title", "url", "summary", "publishedAt", "sent_to_telegram"])
+
+    # Route and queue new articles in the ledger, then in the shared queue
+    queued = 0
+    for a in unique_news:
+        channels = router.route(a)
+        if ledger.enqueue(a, channels):
+            queued += 1
+            aid = article_id(a)
+            for channel in channels:
+                enqueue_delivery(store, cycle, aid, a, channel)
+    print(f"[ℹ️ Ledger] {queued} new articles queued for delivery")
+
+    # Convert unique_news list to DataFrame
+    df_new = pd.DataFrame(unique_news)
+    df_new['sent_to_telegram'] = [ledger.is_sent(article_id(a)) for a in unique_news]
+
+    # Combine old and new, dropping duplicates but preserving 'sent_to_telegram' = True
+    combined = pd.concat([df, df_new], ignore_index=True)
+    combined.sort_values(by=['sent_to_telegram', 'publishedAt'], ascending=[True, True], inplace=True)
+    combined = combined.drop_duplicates(subset=['title', 'url'], keep='last')
+    combined.reset_index(drop=True, inplace=True)
+
+    # Persist the merged articles before sending, so a crash mid-send keeps them
+    combined.to_csv(config.CSV_OUTPUT_PATH, index=False, encoding='utf-8-sig')
+    return len(unique_news)
+
+
+def update_sent_flags(store, ledger, worker):
+    """Rewrite the CSV's sent_to_telegram flags from the shared record of completed deliveries."""
+    with csv_lock(store, worker):
         try:
-            df = pd.read_csv(CSV_OUTPUT_PATH, encoding='utf-8-sig')
-            if 'sent_to_telegram' not in df.columns:
-                df['sent_to_telegram'] = False
+            df = pd.read_csv(config.CSV_OUTPUT_PATH, encoding='utf-8-sig')
         except FileNotFoundError:
-            # No CSV exists yet
-            df = pd.DataFrame(columns=["title", "url", "summary", "publishedAt", "sent_to_telegram"])
+            return
+        sent_ids = store.completed_refs("deliver") | ledger.sent_ids()
+        df['sent_to_telegram'] = sent_flags(df, sent_ids)
+        df.to_csv(config.CSV_OUTPUT_PATH, index=False, encoding='utf-8-sig')
+    print(f"✅ CSV updated with sent status and saved at {config.CSV_OUTPUT_PATH}")
+
 
-        # Convert unique_news list to DataFrame
-        df_new = pd.DataFrame(unique_news)
-        if 'sent_to_telegram' not in df_new.columns:
-            df_new['sent_to_telegram'] = False
+def deliver_pending(store, ledger, router, worker):
+    """
+    Send queued deliveries with one worker per channel, each leasing only its
+    own channel's tasks, one at a time. Returns the number sent.
+    """
+    def next_delivery(channel):
+        while True:
+            tasks = store.lease(worker, ["deliver"], DELIVERY_LEASE_SECONDS, key_prefix=f"deliver:{channel}:")
+            if not tasks:
+                return None
+            task = tasks[0]
+            aid = task.payload["id"]
+            if ledger.is_sent_to(aid, channel):
+                # Sent before a crash that kept the task from being completed
+                store.complete(task, {"message_id": None})
+                continue
+            return aid, task.payload["article"], task
 
-        # Combine old and new, dropping duplicates but preserving 'sent_to_telegram' = True
-        combined = pd.concat([df, df_new], ignore_index=True)
-        combined.sort_values(by=['sent_to_telegram', 'publishedAt'], ascending=[True, True], inplace=True)
-        combined = combined.drop_duplicates(subset=['title', 'url'], keep='last')
-        combined.reset_index(drop=True, inplace=True)
+    def before_send(task):
+        # The rate-limit wait ate into the lease; renew it to cover the send itself
+        return store.extend(task, DELIVERY_LEASE_SECONDS)
 
-        # Filter for unsent articles to send to Telegram
-        to_send = combined[combined['sent_to_telegram'] == False]
+    def on_sent(aid, channel, chat_id, message_id, task):
+        ledger.mark_sent(aid, channel, chat_id, message_id)
+        store.complete(task, {"chat_id": chat_id, "message_id": message_id})
 
-        if to_send.empty:
-            print("No new articles to send.")
+    def on_failed(aid, channel, task, rejected):
+        # Retry on a later run. An outage should not use up the task's attempts, but a
+        # message Telegram rejects (bad markup, unknown chat) does, so it ends up dead.
+        if rejected:
+            store.release(task, "rejected by Telegram", retry_after=DELIVERY_RETRY_SECONDS)
         else:
-            for idx, art in to_send.iterrows():
-                send_message(
-                    TELEGRAM_CHAT_ID,
-                    art.get("title", ""),
-                    art.get("summary", ""),
-                    art.get("url", "")
-                )
-                combined.at[idx, 'sent_to_telegram'] = True
-                time.sleep(5)
-
-        # Save updated CSV including sent flags
-        combined.to_csv(CSV_OUTPUT_PATH, index=False, encoding='utf-8-sig')
-        print(f"✅ CSV updated with sent status and saved at {CSV_OUTPUT_PATH}")
-    else:
-        print("No new articles fetched.")
+            store.release(task, "send failed", retry_after=DELIVERY_RETRY_SECONDS, count_attempt=False)
 
-# Schedule the run every 30 minutes
-schedule.every(30).minutes.do(run)
+    return router.deliver(next_delivery, on_sent, on_failed, before_send)
 
-if __name__ == "__main__":
+
+def run(deliver=True):
+    """
+    Join the current cycle: fetch, merge, then send. With deliver=False the
+    cycle's articles are still stored, routed and queued, but sending is left
+    to a later run.
+    """
+    store = load_store(config.WORK_QUEUE_PATH, config.WORK_QUEUE_STORE, MAX_TASK_ATTEMPTS)
+    worker = default_worker_id()
+    cycle = current_cycle()
+    router = ChannelRouter(config.TELEGRAM_CHANNELS)
+    print(f"[ℹ️ Queue] Worker {worker} joining cycle {cycle}")
+
+    try:
+        with DeliveryLedger(config.LEDGER_PATH) as ledger:
+            seed_ledger(ledger)
+
+            sync_ledger(store, ledger, cycle)
+
+            last_time = get_last_published_time()
+            from_date = last_time.isoformat() if last_time else None
+
+            # Fetch: split per keyword x provider and per feed, shared with other instances
+            enqueue_fetch_tasks(store, cycle, from_date)
+            fetched = drain(
+                store, worker, FETCH_KINDS, run_fetch_task, FETCH_LEASE_SECONDS,
+                cycle=cycle, wait_for_others=FETCH_LEASE_SECONDS,
+            )
+            print(f"[ℹ️ Queue] This worker ran {fetched} fetch tasks")
+
+            # Merge: once every fetch task is finished, exactly one instance merges the cycle
+            merged = 0
+            if store.outstanding(cycle, FETCH_KINDS):
+                print("[ℹ️ Queue] Fetch tasks still running elsewhere; leaving the merge to them")
+            else:
+                store.enqueue(f"{cycle}:merge", cycle, "merge", {})
+
+                def run_merge_task(task):
+                    return {"articles": merge_cycle(store, ledger, router, worker, task.cycle)}
+
+                # Dedup grows with the cycle's articles, so hold the lease for as long as it takes
+                if drain(store, worker, ["merge"], run_merge_task, MERGE_LEASE_SECONDS, cycle=cycle,
+                         heartbeat=True):
+                    merged = store.status(f"{cycle}:merge")[1]["articles"]
+
+            # Deliver: any instance can take any pending delivery
+            sent = 0
+            if deliver:
+                sent = deliver_pending(store, ledger, router, worker)
+                if not sent:
+                    print("No new articles to send.")
+
+            # Save updated CSV including sent flags
+            if sent or merged:
+                update_sent_flags(store, ledger, worker)
+
+            # Finished deliveries are purged too: fetches only keep today's articles, so a
+            # delivery older than the retention window cannot be queued again. A purged dead
+            # delivery that a ledger still lists as pending is re-offered by sync_ledger.
+            store.purge(time.time() - TASK_RETENTION_DAYS * 86400, FETCH_KINDS + ["merge", "deliver"])
+    finally:
+        store.close()
+
+
+def run_forever():
+    """Run now, then again every cycle."""
+    import schedule
+
+    schedule.every(CYCLE_MINUTES).minutes.do(run)
     run()  # run immediately at start
     while True:
         schedule.run_pending()
         time.sleep(10)
+
+
+if __name__ == "__main__":
+    run_forever()
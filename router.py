@@ -0,0 +1,149 @@
+import re
+import threading
+import time
+
+from telegram import TelegramRejected, send_message
+
+# A channel that fails this many sends in a row is left alone until the next run.
+# Rejected messages count too: a wrong chat ID rejects every message.
+MAX_CONSECUTIVE_FAILURES = 3
+
+
+class RateLimiter:
+    """Enforce a minimum interval between sends on one channel."""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._next_at = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_at - now
+            self._next_at = max(now, self._next_at) + self.min_interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class ChannelRouter:
+    """
+    Route articles to Telegram channels by keyword rules.
+
+    All channel keywords are compiled into a single case-insensitive regex,
+    so each article's text is scanned once no matter how many channels exist.
+    Every channel with a matching keyword gets the article, even when its
+    keyword overlaps or sits inside another channel's ("office" in "office
+    space"). Channels without keywords are catch-alls and receive every article.
+    """
+
+    def __init__(self, channels):
+        self.channels = {}
+        self._catch_all = []
+        self._by_keyword = {}  # lowercased keyword -> [channel names]
+        self._channels_for = {}  # lowercased keyword -> channels of every keyword it contains
+        self._limiters = {}    # channel name -> RateLimiter, kept for the router's lifetime
+
+        for ch in channels:
+            name = ch.get("name")
+            if not name or not ch.get("chat_id"):
+                continue  # Channel not configured in the environment
+            self.channels[name] = ch
+            self._limiters[name] = RateLimiter(ch.get("min_interval", 5))
+            keywords = [k for k in ch.get("keywords") or [] if k]
+            if not keywords:
+                self._catch_all.append(name)
+            for k in keywords:
+                self._by_keyword.setdefault(k.lower(), []).append(name)
+
+        if self._by_keyword:
+            # The lookahead is zero-width, so the scan tries every position and also finds
+            # keywords that overlap ("new town" / "town hall"). At a single position only the
+            # longest keyword matches; _channels_for adds the keywords inside it.
+            alternation = "|".join(re.escape(k) for k in sorted(self._by_keyword, key=len, reverse=True))
+            self._pattern = re.compile(rf"(?=\b({alternation})\b)", re.IGNORECASE)
+            for k in self._by_keyword:
+                names = []
+                for inner, inner_names in self._by_keyword.items():
+                    if re.search(rf"\b{re.escape(inner)}\b", k):
+                        names += [n for n in inner_names if n not in names]
+                self._channels_for[k] = names
+        else:
+            self._pattern = None
+
+        print(f"[ℹ️ Router] {len(self.channels)} channels configured: {', '.join(self.channels) or 'none'}")
+
+    def route(self, article):
+        """Return the names of all channels the article should go to."""
+        matched = list(self._catch_all)
+        if self._pattern is not None:
+            text = f"{article.get('title') or ''} {article.get('summary') or ''}"
+            for m in self._pattern.finditer(text):
+                for name in self._channels_for.get(m.group(1).lower(), []):
+                    if name not in matched:
+                        matched.append(name)
+        return matched
+
+    def deliver(self, next_delivery, on_sent, on_failed, before_send=None):
+        """
+        Run one worker per channel until every channel has nothing left to send.
+
+        Each worker pulls its own channel's work with next_delivery(channel),
+        which returns (article_id, article, handle) or None when the channel
+        is drained, and paces sends with the channel's long-lived rate limiter.
+        A slow or throttled channel therefore never holds up the others.
+        before_send(handle) runs after the rate-limit wait; returning False
+        skips the send. on_sent(article_id, channel, chat_id, message_id,
+        handle) and on_failed(article_id, channel, handle, rejected) are called
+        from the worker thread; rejected is True when Telegram refused the
+        message for good rather than failing to take it. A channel stops for
+        this run after MAX_CONSECUTIVE_FAILURES failed sends in a row. Returns
+        the number of messages sent.
+        """
+        sent = []  # list.append is atomic; one entry per delivered message
+
+        def worker(channel):
+            ch = self.channels[channel]
+            limiter = self._limiters[channel]
+            failures = 0
+            while failures < MAX_CONSECUTIVE_FAILURES:
+                item = next_delivery(channel)
+                if item is None:
+                    return
+                aid, art, handle = item
+                limiter.wait()
+                if before_send and not before_send(handle):
+                    continue
+                rejected = False
+                try:
+                    message_id = send_message(
+                        ch["chat_id"],
+                        art.get("title", ""),
+                        art.get("summary", ""),
+                        art.get("url", "")
+                    )
+                except TelegramRejected:
+                    message_id, rejected = None, True
+                except Exception as e:
+                    print(f"[❌ Router ERROR] {channel}: {e}")
+                    message_id = None
+                if message_id is None:
+                    failures += 1
+                    on_failed(aid, channel, handle, rejected)
+                    continue
+                failures = 0
+                sent.append(aid)
+                on_sent(aid, channel, ch["chat_id"], message_id, handle)
+            print(f"[⚠️ Router] {channel}: {failures} failed sends in a row; pausing until the next run")
+
+        threads = [
+            threading.Thread(target=worker, args=(channel,), name=f"telegram-{channel}", daemon=True)
+            for channel in self.channels
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        print(f"✅ Delivery complete: {len(sent)} messages across {len(self.channels)} channels")
+        return len(sent)
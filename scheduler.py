@@ -23,23 +23,23 @@ def job():
     try:
         # Get absolute path relative to this script's directory
         script_dir = os.path.dirname(os.path.abspath(__file__))
-        main_script = os.path.join(script_dir, "main.py")
+        main_script = os.path.join(script_dir, "cli.py")
 
         result = subprocess.run(
-            [sys.executable, main_script],
+            [sys.executable, main_script, "run"],
             capture_output=True,
             text=True,
             timeout=300
         )
 
         if result.returncode != 0:
-            log(f"[❌ ERROR] main.py failed with return code {result.returncode}:\n{result.stderr.strip()}")
+            log(f"[❌ ERROR] cli.py run failed with return code {result.returncode}:\n{result.stderr.strip()}")
         else:
-            log("✅ main.py executed successfully.")
+            log("✅ cli.py run executed successfully.")
             if result.stdout.strip():
                 log(f"[OUTPUT] {result.stdout.strip()}")
     except subprocess.TimeoutExpired:
-        log("[❌ ERROR] main.py execution timed out.")
+        log("[❌ ERROR] cli.py run execution timed out.")
     except Exception as e:
         log(f"[❌ EXCEPTION] {e}")
 
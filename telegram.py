@@ -1,17 +1,33 @@
-import requests
 import re
 import time
-from config import TELEGRAM_BOT_TOKEN
+import config
+
+
+class TelegramRejected(Exception):
+    """
+    Telegram refused the message itself (a 4xx other than 429, e.g. a
+    MarkdownV2 parse error or "chat not found"). Sending it again will not
+    help, unlike a timeout, a 429 or a 5xx.
+    """
+
+    def __init__(self, status_code, description):
+        super().__init__(f"{status_code}: {description}")
+        self.status_code = status_code
+
 
 def escape_markdown(text: str) -> str:
     if not isinstance(text, str):
         return ""
     return re.sub(r'([\\_*[\]()~`>#+\-=|{}.!])', r'\\\1', text)
 
+def escape_link_url(url: str) -> str:
+    # Inside the (...) of a MarkdownV2 link only ")" and "\\" need escaping
+    return re.sub(r'([\\)])', r'\\\1', url)
+
 def format_message(title: str, summary: str, url: str) -> str:
     title_esc = escape_markdown(title or "No Title")
     summary_esc = escape_markdown(summary or "")
-    url_esc = url or ""
+    url_esc = escape_link_url(url) if isinstance(url, str) else ""
     msg = f"*{title_esc}*\n\n"
     if summary_esc:
         msg += f"{summary_esc}\n\n"
@@ -20,8 +36,16 @@ def format_message(title: str, summary: str, url: str) -> str:
     return msg[:4000]
 
 def send_message(chat_id: str, title: str, summary: str, url: str):
+    """
+    Send one article to Telegram. Returns the Telegram message_id, or None if
+    Telegram could not be reached or asked to retry later. Raises
+    TelegramRejected when Telegram refuses the message for good.
+    """
+    import requests  # Imported on first send, like the token below
+
     message = format_message(title, summary, url)
-    url_api = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+    # Resolved on first send, so importing this module does not require the token
+    url_api = f"https://api.telegram.org/bot{config.TELEGRAM_BOT_TOKEN}/sendMessage"
     payload = {
         "chat_id": chat_id,
         "text": message,
@@ -37,10 +61,16 @@ def send_message(chat_id: str, title: str, summary: str, url: str):
             r = requests.post(url_api, json=payload, timeout=60)
             if r.status_code == 200:
                 print(f"✅ Sent: {title}")
-                return
-            else:
-                print(f"[❌ ERROR {r.status_code}] {r.text}")
-                return
+                try:
+                    return r.json()["result"]["message_id"]
+                except Exception:
+                    return 0  # Delivered, but no message_id in the response
+            print(f"[❌ ERROR {r.status_code}] {r.text}")
+            if 400 <= r.status_code < 500 and r.status_code != 429:
+                raise TelegramRejected(r.status_code, r.text)
+            return None
+        except TelegramRejected:
+            raise
         except requests.exceptions.Timeout:
             print(f"[❌ Timeout error] Attempt {attempt}: Sending message timed out: {title}")
         except Exception as e:
@@ -51,3 +81,4 @@ def send_message(chat_id: str, title: str, summary: str, url: str):
             backoff *= 2  # exponential backoff
 
     print(f"[❌ Failed] All {max_retries} attempts to send message timed out or failed: {title}")
+    return None
@@ -0,0 +1,104 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import cli
+import config
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENV_VARS = [name for names in config.SUBSYSTEM_ENV_VARS.values() for name in names]
+
+
+@pytest.fixture
+def no_env(monkeypatch):
+    """No settings in the environment, no .env file and nothing resolved yet."""
+    for name in ENV_VARS + ["LEDGER_PATH", "WORK_QUEUE_PATH", "WORK_QUEUE_STORE"]:
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(config, "_env_loaded", True)
+    for name in config._LAZY_SETTINGS:
+        monkeypatch.delitem(vars(config), name, raising=False)
+    return monkeypatch
+
+
+def import_only(*args):
+    env = {k: v for k, v in os.environ.items() if k not in ENV_VARS}
+    return subprocess.run(
+        [sys.executable, os.path.join(REPO, "cli.py"), "--import-only", *args],
+        cwd=REPO, env=env, capture_output=True, text=True,
+    )
+
+
+@pytest.mark.parametrize("command", ["send", "export"])
+def test_import_only_needs_no_settings(command):
+    result = import_only(command, "--title", "t") if command == "send" else import_only(command)
+    assert result.returncode == 0, result.stderr
+
+
+@pytest.mark.parametrize("command", ["run", "fetch-only"])
+def test_import_only_of_the_full_pipeline_needs_no_settings(command):
+    for module in ("pandas", "requests", "feedparser", "sklearn"):
+        pytest.importorskip(module)
+    result = import_only(command)
+    assert result.returncode == 0, result.stderr
+
+
+def test_modules_that_read_settings_import_without_them():
+    result = subprocess.run(
+        [sys.executable, "-c", "import utils, telegram, router, work_queue, ledger"],
+        cwd=REPO, env={k: v for k, v in os.environ.items() if k not in ENV_VARS},
+        capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stderr
+
+
+def test_send_with_chat_id_needs_only_the_bot_token(no_env, capsys):
+    import telegram
+
+    sent = []
+    no_env.setattr(telegram, "send_message", lambda *a: sent.append(a) or 7)
+    assert cli.cli(["send", "--title", "t", "--chat-id", "99"]) == 2
+    assert "TELEGRAM_BOT_TOKEN" in capsys.readouterr().err
+
+    no_env.setenv("TELEGRAM_BOT_TOKEN", "token")
+    assert cli.cli(["send", "--title", "t", "--chat-id", "99"]) == 0
+    assert sent == [("99", "t", "", "")]
+
+
+def test_send_without_chat_id_needs_the_default_chat(no_env, capsys):
+    no_env.setenv("TELEGRAM_BOT_TOKEN", "token")
+    assert cli.cli(["send", "--title", "t"]) == 2
+    err = capsys.readouterr().err
+    assert "TELEGRAM_CHAT_ID" in err and "GNEWS_API_KEY" not in err
+
+
+def test_export_of_a_given_file_needs_no_settings(no_env, tmp_path, capsys):
+    src = tmp_path / "in.csv"
+    src.write_text("title,url,sent_to_telegram\nA,u1,True\nB,u2,False\n", encoding="utf-8")
+    assert cli.cli(["export", "-i", str(src), "--unsent", "--columns", "title"]) == 0
+    assert capsys.readouterr().out.splitlines() == ["title", "B"]
+
+
+def test_export_of_the_live_csv_needs_storage(no_env, capsys):
+    assert cli.cli(["export"]) == 2
+    assert "ONEDRIVE_FOLDER" in capsys.readouterr().err
+
+
+def test_dedup_waits_for_the_csv_writer_lock(no_env, tmp_path, capsys):
+    pytest.importorskip("pandas")
+    pytest.importorskip("sklearn")
+    import main
+    from work_queue import SQLiteTaskStore
+
+    no_env.setenv("ONEDRIVE_FOLDER", str(tmp_path))
+    no_env.setenv("WORK_QUEUE_PATH", str(tmp_path / "queue.sqlite3"))
+    live = tmp_path / "real_estate_kolkata.csv"
+    live.write_text("title,url\nA,u1\n", encoding="utf-8")
+    holder = SQLiteTaskStore(str(tmp_path / "queue.sqlite3"))
+    assert holder.acquire_lock(main.CSV_LOCK, "scheduled-run", 60)
+    no_env.setattr(config, "CSV_LOCK_WAIT_SECONDS", 0)
+
+    assert cli.cli(["dedup"]) == 1
+    assert "lock" in capsys.readouterr().err
+    holder.close()
@@ -0,0 +1,175 @@
+import time
+
+import pytest
+
+import router
+from router import ChannelRouter
+from telegram import TelegramRejected
+from work_queue import DEAD, DONE, SQLiteTaskStore, TaskStore, drain
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteTaskStore(str(tmp_path / "queue.sqlite3"), max_attempts=2)
+    yield store
+    store.close()
+
+
+def test_enqueue_is_idempotent(store):
+    assert store.enqueue("k", "c", "fetch", {"n": 1})
+    assert not store.enqueue("k", "c", "fetch", {"n": 2})
+    assert store.lease("w", ["fetch"], 60)[0].payload == {"n": 1}
+
+
+def test_lease_is_exclusive_until_it_expires(store):
+    store.enqueue("k", "c", "fetch", {})
+    first = store.lease("a", ["fetch"], 0.05)[0]
+    assert store.lease("b", ["fetch"], 60) == []
+
+    time.sleep(0.1)
+    second = store.lease("b", ["fetch"], 60)[0]
+    assert second.attempts == 2
+
+    # The first holder lost its lease and cannot complete the task
+    assert not store.complete(first, "stale")
+    assert store.complete(second, "fresh")
+    # Completing again, with either token, is a no-op
+    assert store.complete(first, "stale")
+    assert store.status("k") == (DONE, "fresh")
+
+
+def test_extend_keeps_the_lease(store):
+    store.enqueue("k", "c", "fetch", {})
+    task = store.lease("a", ["fetch"], 0.05)[0]
+    assert store.extend(task, 60)
+    time.sleep(0.1)
+    assert store.lease("b", ["fetch"], 60) == []
+
+
+def test_release_with_retry_after_hides_the_task(store):
+    store.enqueue("k", "c", "deliver", {})
+    task = store.lease("a", ["deliver"], 60)[0]
+    store.release(task, "send failed", retry_after=0.1, count_attempt=False)
+    assert store.lease("a", ["deliver"], 60) == []
+
+    time.sleep(0.15)
+    retried = store.lease("a", ["deliver"], 60)[0]
+    assert retried.attempts == 1  # The failed send did not count
+
+
+def test_counted_failures_end_dead(store):
+    store.enqueue("k", "c", "fetch", {})
+    for _ in range(2):
+        store.release(store.lease("a", ["fetch"], 60)[0], "boom")
+    assert store.lease("a", ["fetch"], 60) == []
+    assert store.status("k")[0] == DEAD
+    assert store.outstanding("c", ["fetch"]) == 0
+
+
+def test_released_tasks_go_behind_untried_ones(store):
+    for key in ("first", "second"):
+        store.enqueue(key, "c", "deliver", {})
+    store.release(store.lease("a", ["deliver"], 60)[0], "send failed", count_attempt=False)
+    assert [t.key for t in store.lease("a", ["deliver"], 60, limit=2)] == ["second", "first"]
+
+
+def test_undeliverable_tasks_do_not_block_a_channel(store, monkeypatch):
+    # Same callbacks as main.deliver_pending, without its pandas import
+    poison = [f"deliver:legal:bad{i}" for i in range(4)]
+    for key in poison + ["deliver:legal:good"]:
+        store.enqueue(key, "c", "deliver", {"id": key, "article": {"title": key}})
+
+    def fake_send(chat_id, title, summary, url):
+        if "bad" in title:
+            raise TelegramRejected(400, "can't parse entities")
+        return 1
+
+    monkeypatch.setattr(router, "send_message", fake_send)
+    legal = ChannelRouter([{"name": "legal", "chat_id": "42", "keywords": ["RERA"], "min_interval": 0}])
+
+    def next_delivery(channel):
+        tasks = store.lease("w", ["deliver"], 60, key_prefix=f"deliver:{channel}:")
+        return (tasks[0].key, tasks[0].payload["article"], tasks[0]) if tasks else None
+
+    def on_failed(aid, channel, task, rejected):
+        store.release(task, "send failed", count_attempt=rejected)
+
+    sent_in_run = []
+    for _ in range(6):
+        sent_in_run.append(legal.deliver(
+            next_delivery, lambda aid, ch, chat, mid, task: store.complete(task, mid), on_failed,
+        ))
+        if not store.outstanding("c", ["deliver"]):
+            break
+
+    # The first run gives up after three rejections; the second reaches the good task
+    assert sent_in_run[:2] == [0, 1]
+    assert store.status("deliver:legal:good")[0] == DONE
+    assert all(store.status(key)[0] == DEAD for key in poison)
+    assert store.outstanding("c", ["deliver"]) == 0
+
+
+def test_key_prefix_limits_lease_to_one_channel(store):
+    store.enqueue("deliver:legal:1", "c", "deliver", {}, ref="1")
+    store.enqueue("deliver:default:1", "c", "deliver", {}, ref="1")
+    leased = store.lease("a", ["deliver"], 60, limit=5, key_prefix="deliver:legal:")
+    assert [t.key for t in leased] == ["deliver:legal:1"]
+
+
+def test_completed_refs_need_every_task_done(store):
+    for key in ("deliver:a:1", "deliver:b:1", "deliver:a:2"):
+        store.enqueue(key, "c", "deliver", {}, ref=key.rsplit(":", 1)[1])
+    for key in ("deliver:a:1", "deliver:a:2"):
+        store.complete(store.lease("w", ["deliver"], 60, key_prefix=key)[0])
+    assert store.completed_refs("deliver") == {"2"}
+
+
+def test_lock_is_exclusive_and_expires(store):
+    token = store.acquire_lock("csv-writer", "a", 60)
+    assert token
+    assert store.acquire_lock("csv-writer", "b", 60) is None
+    store.release_lock("csv-writer", token)
+
+    assert store.acquire_lock("csv-writer", "b", 0.05)
+    time.sleep(0.1)
+    assert store.acquire_lock("csv-writer", "a", 60)
+
+
+def test_extend_lock_keeps_it(store):
+    token = store.acquire_lock("csv-writer", "a", 0.05)
+    assert store.extend_lock("csv-writer", token, 60)
+    time.sleep(0.1)
+    assert store.acquire_lock("csv-writer", "b", 60) is None
+    assert not store.extend_lock("csv-writer", "stale", 60)
+
+
+def test_heartbeat_holds_the_lease_through_a_slow_handler(store):
+    store.enqueue("merge", "c", "merge", {})
+    stolen = []
+
+    def slow_merge(task):
+        time.sleep(0.3)  # Outlasts the 0.1 s lease several times over
+        stolen.extend(store.lease("b", ["merge"], 0.1))
+        return "merged"
+
+    assert drain(store, "a", ["merge"], slow_merge, 0.1, heartbeat=True) == 1
+    assert stolen == []
+    assert store.status("merge") == (DONE, "merged")
+
+
+def test_purge_removes_only_finished_tasks(store):
+    store.enqueue("done", "c", "deliver", {})
+    store.enqueue("pending", "c", "deliver", {})
+    store.complete(store.lease("w", ["deliver"], 60, key_prefix="done")[0])
+    assert store.purge(time.time() + 1, ["deliver"]) == 1
+    assert store.status("done") is None
+    assert store.status("pending")[0] == "pending"
+
+
+def test_incomplete_store_fails_at_construction():
+    class HalfStore(TaskStore):
+        def enqueue(self, key, cycle, kind, payload, ref=None):
+            return True
+
+    with pytest.raises(TypeError):
+        HalfStore()
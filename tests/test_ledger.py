@@ -0,0 +1,112 @@
+import json
+import os
+
+import pytest
+
+from ledger import DEFAULT_CHANNEL, DeliveryLedger, article_id
+
+
+ARTICLE = {"title": "RERA ruling on Kolkata flats", "url": "https://example.com/a", "summary": ""}
+
+
+@pytest.fixture
+def ledger_path(tmp_path):
+    return str(tmp_path / "ledger.jsonl")
+
+
+def test_ledger_replays_partial_delivery(ledger_path):
+    aid = article_id(ARTICLE)
+    with DeliveryLedger(ledger_path) as ledger:
+        assert ledger.enqueue(ARTICLE, ["default", "legal"])
+        assert not ledger.enqueue(ARTICLE, ["default"])
+        ledger.mark_sent(aid, "default", "chat", 11)
+
+    with DeliveryLedger(ledger_path) as ledger:
+        assert ledger.is_sent_to(aid, "default")
+        assert not ledger.is_sent(aid)
+        assert [(a, c) for a, _, c in ledger.pending()] == [(aid, "legal")]
+        ledger.mark_sent(aid, "legal", "chat", 12)
+
+    with DeliveryLedger(ledger_path) as ledger:
+        assert ledger.is_sent(aid)
+        assert ledger.pending() == []
+        assert ledger.sent_ids() == {aid}
+
+
+def test_ledger_skips_torn_record_and_keeps_appending(ledger_path):
+    with DeliveryLedger(ledger_path) as ledger:
+        ledger.enqueue(ARTICLE)
+    with open(ledger_path, "a", encoding="utf-8") as f:
+        f.write('{"op": "sent", "id"')  # Crash mid-write
+
+    other = {"title": "Second", "url": "https://example.com/b"}
+    with DeliveryLedger(ledger_path) as ledger:
+        assert ledger.enqueue(other)
+
+    with DeliveryLedger(ledger_path) as ledger:
+        assert {a for a, _, _ in ledger.pending()} == {article_id(ARTICLE), article_id(other)}
+
+
+def test_ledger_reads_records_without_channels_as_default(ledger_path):
+    aid = article_id(ARTICLE)
+    with open(ledger_path, "w", encoding="utf-8") as f:
+        f.write('{"op": "queued", "id": "%s", "article": {}}\n' % aid)
+    with DeliveryLedger(ledger_path) as ledger:
+        assert [c for _, _, c in ledger.pending()] == [DEFAULT_CHANNEL]
+
+
+def test_ledger_seeded_marker_survives_restart(ledger_path):
+    with DeliveryLedger(ledger_path) as ledger:
+        assert not ledger.seeded
+        ledger.mark_seeded()
+    with DeliveryLedger(ledger_path) as ledger:
+        assert ledger.seeded
+
+
+def test_mark_sent_many_skips_known_deliveries(ledger_path):
+    first, second = article_id(ARTICLE), article_id({"title": "Second", "url": "b"})
+    with DeliveryLedger(ledger_path) as ledger:
+        ledger.mark_sent(first)
+        assert ledger.mark_sent_many([first, second, second]) == 1
+    with DeliveryLedger(ledger_path) as ledger:
+        assert ledger.sent_ids() == {first, second}
+
+
+def test_compaction_keeps_state_and_drops_delivered_articles(ledger_path):
+    pending = {"title": "Still pending", "url": "https://example.com/p", "summary": "x" * 200}
+    with DeliveryLedger(ledger_path) as ledger:
+        ledger.mark_seeded()
+        for i in range(50):
+            article = {"title": f"Article {i}", "url": f"https://example.com/{i}", "summary": "x" * 200}
+            ledger.enqueue(article, ["default", "legal"])
+            ledger.mark_sent(article_id(article), "default", "chat", i)
+            ledger.mark_sent(article_id(article), "legal", "chat", 100 + i)
+        ledger.enqueue(pending, ["default", "legal"])
+        ledger.mark_sent(article_id(pending), "legal", "chat", 999)
+        sent_before = ledger.sent_ids()
+    size_before = os.path.getsize(ledger_path)
+
+    with DeliveryLedger(ledger_path, compact_bytes=1000) as ledger:
+        assert ledger.seeded
+        assert ledger.sent_ids() == sent_before
+        assert [(a, c) for a, _, c in ledger.pending()] == [(article_id(pending), "default")]
+        assert ledger.is_sent_to(article_id(pending), "legal")
+        ledger.mark_sent(article_id(pending), "default", "chat", 1000)
+
+    assert os.path.getsize(ledger_path) < size_before
+    with open(ledger_path, encoding="utf-8") as f:
+        queued = [r for r in map(json.loads, f) if r["op"] == "queued"]
+    assert [r["article"]["title"] for r in queued] == ["Still pending"]
+
+    with DeliveryLedger(ledger_path) as ledger:
+        assert ledger.pending() == []
+        assert ledger.is_sent(article_id(pending))
+
+
+def test_small_ledger_is_not_compacted(ledger_path):
+    with DeliveryLedger(ledger_path) as ledger:
+        ledger.enqueue(ARTICLE)
+        ledger.mark_sent(article_id(ARTICLE))
+    size = os.path.getsize(ledger_path)
+    DeliveryLedger(ledger_path).close()
+    assert os.path.getsize(ledger_path) == size
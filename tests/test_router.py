@@ -0,0 +1,41 @@
+from router import ChannelRouter
+
+
+def make_router(*channels):
+    return ChannelRouter([
+        {"name": name, "chat_id": f"chat-{name}", "keywords": keywords, "min_interval": 0}
+        for name, keywords in channels
+    ])
+
+
+def test_routes_by_keyword_ignoring_case():
+    router = make_router(("legal", ["RERA", "stamp duty"]), ("kolkata", ["Kolkata"]))
+    assert router.route({"title": "rera fines builder", "summary": "KOLKATA project"}) == ["legal", "kolkata"]
+    assert router.route({"title": "Stamp Duty cut", "summary": None}) == ["legal"]
+    assert router.route({"title": "Markets rally"}) == []
+
+
+def test_keywords_match_whole_words_only():
+    router = make_router(("legal", ["court"]))
+    assert router.route({"title": "Courtyard homes launched"}) == []
+    assert router.route({"title": "High court stays demolition"}) == ["legal"]
+
+
+def test_keyword_inside_another_channels_keyword_matches_both():
+    router = make_router(("commercial", ["office"]), ("cw", ["office space"]))
+    assert sorted(router.route({"title": "New office space in New Town"})) == ["commercial", "cw"]
+    assert router.route({"title": "New office in Salt Lake"}) == ["commercial"]
+
+
+def test_overlapping_keywords_both_match():
+    router = make_router(("kolkata", ["new town"]), ("civic", ["town hall"]))
+    assert sorted(router.route({"title": "New Town Hall opens"})) == ["civic", "kolkata"]
+
+
+def test_catch_all_gets_everything_and_unconfigured_channels_are_skipped():
+    router = ChannelRouter([
+        {"name": "default", "chat_id": "1", "keywords": []},
+        {"name": "legal", "chat_id": None, "keywords": ["RERA"]},
+    ])
+    assert list(router.channels) == ["default"]
+    assert router.route({"title": "RERA order"}) == ["default"]
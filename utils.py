@@ -1,25 +1,30 @@
-import pandas as pd
 import os
-from config import CSV_OUTPUT_PATH
-from typing import Optional
+import config
+from typing import Optional, TYPE_CHECKING
 
-def get_last_published_time() -> Optional[pd.Timestamp]:
+if TYPE_CHECKING:
+    import pandas as pd
+
+def get_last_published_time() -> Optional["pd.Timestamp"]:
     """
     Retrieves the latest 'publishedAt' datetime from the CSV file.
 
     Returns:
         pd.Timestamp or None: Latest publication time if found and valid, else None.
     """
+    import pandas as pd
+
+    csv_path = config.CSV_OUTPUT_PATH
     try:
-        if not CSV_OUTPUT_PATH or not isinstance(CSV_OUTPUT_PATH, str) or not CSV_OUTPUT_PATH.endswith(".csv"):
+        if not csv_path or not isinstance(csv_path, str) or not csv_path.endswith(".csv"):
             print("[⚠️] Invalid or missing CSV_OUTPUT_PATH in config.")
             return None
 
-        if not os.path.exists(CSV_OUTPUT_PATH):
+        if not os.path.exists(csv_path):
             print("[ℹ️] CSV file does not exist yet. No previous records found.")
             return None
 
-        df = pd.read_csv(CSV_OUTPUT_PATH)
+        df = pd.read_csv(csv_path)
         if df.empty or "publishedAt" not in df.columns:
             print("[ℹ️] No 'publishedAt' data in CSV. Nothing to compare.")
             return None
@@ -0,0 +1,418 @@
+import importlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from contextlib import contextmanager
+
+# A leased unit of work. `token` identifies this particular lease; only the
+# holder of the current token can complete or release the task.
+Task = namedtuple("Task", ["key", "cycle", "kind", "payload", "token", "attempts"])
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+DEAD = "dead"
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class TaskStore(ABC):
+    """
+    Interface for the shared work queue used by aggregator instances.
+
+    Tasks are identified by a caller-chosen key, so enqueueing the same work
+    twice (from two instances, or twice from one) is a no-op. A lease hides a
+    task from other workers for `visibility_timeout` seconds; if the holder
+    dies, the lease expires and another instance picks the task up. After
+    `max_attempts` leases without completion a task is marked dead.
+
+    Replace the default SQLite store with a service-backed one by subclassing
+    this and pointing WORK_QUEUE_STORE at it (see load_store). A subclass
+    that misses a method fails when it is constructed, not mid-cycle.
+    """
+
+    @abstractmethod
+    def enqueue(self, key: str, cycle: str, kind: str, payload, ref=None) -> bool:
+        """
+        Add a task unless one with the same key exists. Returns True if added.
+        `ref` groups related tasks, e.g. all deliveries of one article.
+        """
+
+    @abstractmethod
+    def status(self, key: str):
+        """Return (status, result) for a task, or None if there is no such task."""
+
+    @abstractmethod
+    def completed_refs(self, kind: str):
+        """Refs whose tasks of this kind are all done, e.g. articles delivered to every channel."""
+
+    @abstractmethod
+    def lease(self, worker_id: str, kinds, visibility_timeout: float, cycle=None, limit: int = 1,
+              key_prefix=None):
+        """
+        Lease up to `limit` visible tasks of the given kinds, optionally only
+        those whose key starts with `key_prefix`. Tasks never tried come first,
+        then released ones in the order they were released, so tasks that
+        keep failing cannot stay at the head of the queue. Returns a list of Task.
+        """
+
+    @abstractmethod
+    def extend(self, task: Task, visibility_timeout: float) -> bool:
+        """Push a held lease's expiry to now + visibility_timeout. Returns False if the lease was lost."""
+
+    @abstractmethod
+    def complete(self, task: Task, result=None) -> bool:
+        """
+        Mark a leased task done and store its result. Completing a task that
+        is already done is a no-op that returns True; returns False only if
+        the lease was lost and the task is not done.
+        """
+
+    @abstractmethod
+    def release(self, task: Task, error=None, retry_after: float = 0, count_attempt: bool = True):
+        """
+        Give a leased task back so it can be retried (or marked dead). It stays
+        hidden for `retry_after` seconds. With count_attempt=False the lease
+        does not count towards max_attempts, for failures that are expected
+        to clear up (e.g. Telegram being unreachable).
+        """
+
+    @abstractmethod
+    def outstanding(self, cycle: str, kinds) -> int:
+        """Number of tasks in the cycle that are neither done nor dead."""
+
+    @abstractmethod
+    def results(self, cycle: str, kinds):
+        """Results of the cycle's done tasks of the given kinds."""
+
+    @abstractmethod
+    def acquire_lock(self, name: str, owner: str, ttl: float):
+        """
+        Take a named lock shared by all instances, independent of any cycle.
+        Returns a token, or None if someone else holds it. A holder that dies
+        loses the lock after `ttl` seconds.
+        """
+
+    @abstractmethod
+    def extend_lock(self, name: str, token: str, ttl: float) -> bool:
+        """Push a held lock's expiry to now + ttl. Returns False if the lock was lost."""
+
+    @abstractmethod
+    def release_lock(self, name: str, token: str):
+        """Release a lock taken with acquire_lock; a stale token is ignored."""
+
+    @abstractmethod
+    def purge(self, older_than: float, kinds):
+        """Delete finished tasks of the given kinds last updated before `older_than` (epoch seconds)."""
+
+    def close(self):
+        pass
+
+
+class SQLiteTaskStore(TaskStore):
+    """
+    Default TaskStore on a single SQLite file.
+
+    Leasing runs inside BEGIN IMMEDIATE, so concurrent processes on the
+    same file cannot lease the same task. Put the file on storage every
+    instance can reach, or swap in a service-backed store for multi-host
+    deployments where shared file locking is not reliable.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 3):
+        self.path = path
+        self.max_attempts = max_attempts
+        dir_path = os.path.dirname(path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+        # Router workers complete tasks from their own threads
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                key TEXT PRIMARY KEY,
+                cycle TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                payload TEXT,
+                status TEXT NOT NULL DEFAULT 'pending',
+                lease_owner TEXT,
+                lease_token TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                visible_after REAL,
+                ref TEXT,
+                result TEXT,
+                error TEXT,
+                updated_at REAL NOT NULL
+            )
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(tasks)")}
+        if "visible_after" not in columns:
+            self._conn.execute("ALTER TABLE tasks ADD COLUMN visible_after REAL")
+        if "ref" not in columns:
+            self._conn.execute("ALTER TABLE tasks ADD COLUMN ref TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_by_ref ON tasks (kind, ref)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS locks (
+                name TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                token TEXT NOT NULL,
+                expires REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_by_status ON tasks (kind, status, lease_expires)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_by_cycle ON tasks (cycle, kind, status)")
+
+    def enqueue(self, key, cycle, kind, payload, ref=None) -> bool:
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO tasks (key, cycle, kind, payload, ref, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, cycle, kind, json.dumps(payload, ensure_ascii=False), ref, time.time()),
+            )
+            return cur.rowcount == 1
+
+    def status(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT status, result FROM tasks WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]) if row[1] is not None else None
+
+    def completed_refs(self, kind):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT ref FROM tasks WHERE kind = ? AND ref IS NOT NULL GROUP BY ref "
+                "HAVING SUM(status != ?) = 0",
+                (kind, DONE),
+            ).fetchall()
+        return {r[0] for r in rows}
+
+    def lease(self, worker_id, kinds, visibility_timeout, cycle=None, limit=1, key_prefix=None):
+        kinds = list(kinds)
+        now = time.time()
+        visible = (
+            f"kind IN ({','.join('?' * len(kinds))}) "
+            f"AND (status = ? OR (status = ? AND lease_expires < ?)) "
+            f"AND (visible_after IS NULL OR visible_after <= ?)"
+        )
+        visible_params = kinds + [PENDING, LEASED, now, now]
+        query = f"SELECT key, cycle, kind, payload, attempts FROM tasks WHERE {visible} AND attempts < ?"
+        params = visible_params + [self.max_attempts]
+        if cycle is not None:
+            query += " AND cycle = ?"
+            params.append(cycle)
+        if key_prefix is not None:
+            query += " AND substr(key, 1, ?) = ?"
+            params += [len(key_prefix), key_prefix]
+        query += " ORDER BY COALESCE(visible_after, 0), rowid LIMIT ?"
+        params.append(limit)
+
+        leased = []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Visible tasks that have used up their attempts will never run
+                dead = self._conn.execute(
+                    f"UPDATE tasks SET status = ?, lease_token = NULL, updated_at = ? "
+                    f"WHERE {visible} AND attempts >= ?",
+                    [DEAD, now] + visible_params + [self.max_attempts],
+                ).rowcount
+                if dead:
+                    print(f"[⚠️ Queue] Gave up on {dead} tasks after {self.max_attempts} attempts")
+                for key, task_cycle, kind, payload, attempts in self._conn.execute(query, params).fetchall():
+                    token = uuid.uuid4().hex
+                    self._conn.execute(
+                        "UPDATE tasks SET status = ?, lease_owner = ?, lease_token = ?, lease_expires = ?, "
+                        "attempts = attempts + 1, updated_at = ? WHERE key = ?",
+                        (LEASED, worker_id, token, now + visibility_timeout, now, key),
+                    )
+                    leased.append(Task(key, task_cycle, kind, json.loads(payload), token, attempts + 1))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return leased
+
+    def complete(self, task, result=None) -> bool:
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE tasks SET status = ?, result = ?, lease_token = NULL, updated_at = ? "
+                "WHERE key = ? AND lease_token = ? AND status = ?",
+                (DONE, json.dumps(result, ensure_ascii=False), time.time(), task.key, task.token, LEASED),
+            )
+            if cur.rowcount == 1:
+                return True
+            row = self._conn.execute("SELECT status FROM tasks WHERE key = ?", (task.key,)).fetchone()
+            return bool(row) and row[0] == DONE
+
+    def extend(self, task, visibility_timeout) -> bool:
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE tasks SET lease_expires = ?, updated_at = ? WHERE key = ? AND lease_token = ? AND status = ?",
+                (now + visibility_timeout, now, task.key, task.token, LEASED),
+            )
+            return cur.rowcount == 1
+
+    def release(self, task, error=None, retry_after=0, count_attempt=True):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE tasks SET status = ?, lease_token = NULL, lease_expires = NULL, error = ?, "
+                "visible_after = ?, attempts = attempts - ?, updated_at = ? "
+                "WHERE key = ? AND lease_token = ? AND status = ?",
+                (PENDING, str(error) if error else None, now + retry_after,
+                 0 if count_attempt else 1, now, task.key, task.token, LEASED),
+            )
+
+    def outstanding(self, cycle, kinds) -> int:
+        kinds = list(kinds)
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT COUNT(*) FROM tasks WHERE cycle = ? AND kind IN ({','.join('?' * len(kinds))}) "
+                f"AND status NOT IN (?, ?)",
+                [cycle] + kinds + [DONE, DEAD],
+            ).fetchone()
+        return row[0]
+
+    def results(self, cycle, kinds):
+        kinds = list(kinds)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT result FROM tasks WHERE cycle = ? AND kind IN ({','.join('?' * len(kinds))}) "
+                f"AND status = ? ORDER BY rowid",
+                [cycle] + kinds + [DONE],
+            ).fetchall()
+        return [json.loads(r[0]) for r in rows if r[0] is not None]
+
+    def acquire_lock(self, name, owner, ttl):
+        now = time.time()
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT expires FROM locks WHERE name = ?", (name,)).fetchone()
+                if row is not None and row[0] >= now:
+                    self._conn.execute("ROLLBACK")
+                    return None
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO locks (name, owner, token, expires) VALUES (?, ?, ?, ?)",
+                    (name, owner, token, now + ttl),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return token
+
+    def extend_lock(self, name, token, ttl) -> bool:
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE locks SET expires = ? WHERE name = ? AND token = ?", (time.time() + ttl, name, token)
+            )
+            return cur.rowcount == 1
+
+    def release_lock(self, name, token):
+        with self._lock:
+            self._conn.execute("DELETE FROM locks WHERE name = ? AND token = ?", (name, token))
+
+    def purge(self, older_than, kinds):
+        kinds = list(kinds)
+        with self._lock:
+            cur = self._conn.execute(
+                f"DELETE FROM tasks WHERE kind IN ({','.join('?' * len(kinds))}) "
+                f"AND status IN (?, ?) AND updated_at < ?",
+                kinds + [DONE, DEAD, older_than],
+            )
+            return cur.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def load_store(path: str, store_spec=None, max_attempts: int = 3) -> TaskStore:
+    """
+    Build the configured TaskStore. `store_spec` is "module:ClassName" for a
+    custom store (constructed with path and max_attempts); None means SQLite.
+    """
+    if not store_spec:
+        return SQLiteTaskStore(path, max_attempts=max_attempts)
+    module_name, _, class_name = store_spec.partition(":")
+    if not class_name:
+        raise ValueError(f"WORK_QUEUE_STORE must look like 'module:ClassName', got '{store_spec}'")
+    store_cls = getattr(importlib.import_module(module_name), class_name)
+    return store_cls(path, max_attempts=max_attempts)
+
+
+@contextmanager
+def keep_alive(renew, interval: float, what: str):
+    """
+    Call renew() every `interval` seconds from a background thread while the
+    block runs, to hold a lease or lock through work of unknown length. Stops
+    renewing once renew() returns False, i.e. the lease was lost.
+    """
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(interval):
+            if not renew():
+                print(f"[⚠️ Queue] Lost {what} while still working on it")
+                return
+
+    thread = threading.Thread(target=beat, name=f"keep-alive {what}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def drain(store: TaskStore, worker_id: str, kinds, handler, visibility_timeout: float,
+          cycle=None, wait_for_others: float = 0, poll_interval: float = 5, heartbeat: bool = False):
+    """
+    Lease and run tasks until none are left, completing each with handler(task)'s
+    return value. Tasks whose handler raises are released for retry. With
+    heartbeat, the lease is extended while the handler runs, for tasks that
+    can outlast visibility_timeout; leave it off for tasks that may hang,
+    so another instance can take them over.
+
+    With wait_for_others > 0 and a cycle, keeps polling for up to that many
+    seconds while other instances still hold leases in the cycle, so tasks
+    from an instance that died are taken over once their lease expires.
+    Returns the number of tasks this worker completed.
+    """
+    done = 0
+    deadline = time.monotonic() + wait_for_others
+    while True:
+        tasks = store.lease(worker_id, kinds, visibility_timeout, cycle=cycle)
+        if not tasks:
+            if cycle is None or time.monotonic() >= deadline or not store.outstanding(cycle, kinds):
+                return done
+            time.sleep(poll_interval)
+            continue
+        task = tasks[0]
+        try:
+            if heartbeat:
+                with keep_alive(lambda: store.extend(task, visibility_timeout), visibility_timeout / 3,
+                                f"lease on {task.key}"):
+                    result = handler(task)
+            else:
+                result = handler(task)
+        except Exception as e:
+            print(f"[❌ Queue ERROR] {task.key}: {e}")
+            store.release(task, e)
+            continue
+        if store.complete(task, result):
+            done += 1
+        else:
+            print(f"[⚠️ Queue] Lease on {task.key} expired before completion; result discarded")